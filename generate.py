@@ -1,84 +1,199 @@
+import csv
+import io
 import random
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import faker
+import numpy as np
 import psycopg2
 
+# Constants for data generation
+TOTAL_USERS = 1000
+TOTAL_MOVIES = 200
+MOVIES_PER_USER_RANGE = (5, 20)
+GENRES = ['Action', 'Comedy', 'Drama', 'Horror', 'Sci-Fi', 'Romance', 'Documentary', 'Thriller']
+PLAN_TYPES = ['Basic', 'Standard', 'Premium']
+COUNTRIES = ['USA', 'Canada', 'UK', 'France', 'Germany', 'Japan', 'Australia', 'Brazil']
+FAKER_POOL_SIZE = 200  # names/emails are sampled from pools this size
+
+# Same volume and distributions as generate_test_data, produced by the server in one round trip
+SERVER_SIDE_GENERATION_SQL = """
+DO $$
+DECLARE
+    countries text[] := %(countries)s;
+    plan_types text[] := %(plan_types)s;
+    genres text[] := %(genres)s;
+BEGIN
+    INSERT INTO users (name, email, signup_date, country)
+    SELECT 'User ' || g,
+           'user' || g || '@example.com',
+           CURRENT_DATE - floor(random() * 1096)::int,
+           countries[1 + floor(random() * array_length(countries, 1))::int]
+    FROM generate_series(1, %(total_users)s) g;
+
+    INSERT INTO subscriptions (user_id, plan_type, status, renewal_date)
+    SELECT u.user_id,
+           plan_types[1 + floor(random() * array_length(plan_types, 1))::int],
+           u.status,
+           CASE WHEN u.status = 'cancelled'
+                THEN u.signup_date + floor(random() * (CURRENT_DATE - u.signup_date + 1))::int
+                ELSE CURRENT_DATE + 1 + floor(random() * 365)::int
+           END
+    FROM (
+        SELECT user_id, signup_date,
+               CASE WHEN r < 0.8 THEN 'active' WHEN r < 0.95 THEN 'cancelled' ELSE 'paused' END AS status
+        FROM (SELECT user_id, signup_date, random() AS r FROM users) s
+    ) u;
+
+    INSERT INTO movies (title, genre, release_year, rating)
+    SELECT 'Movie ' || g,
+           genres[1 + floor(random() * array_length(genres, 1))::int],
+           1990 + floor(random() * 35)::int,
+           round((1 + random() * 9)::numeric, 1)
+    FROM generate_series(1, %(total_movies)s) g;
+
+    -- LIMIT u.n correlates the lateral subquery, so each user gets its own sample
+    INSERT INTO viewing_history (user_id, movie_id, watch_time, duration_watched)
+    SELECT u.user_id,
+           m.movie_id,
+           u.signup_date + random() * (LOCALTIMESTAMP - u.signup_date),
+           10 + floor(random() * 171)::int
+    FROM (
+        SELECT user_id, signup_date,
+               %(min_movies)s + floor(random() * (%(max_movies)s - %(min_movies)s + 1))::int AS n
+        FROM users
+    ) u
+    CROSS JOIN LATERAL (
+        SELECT movie_id FROM movies ORDER BY random() LIMIT u.n
+    ) m;
+END
+$$;
+"""
+
+
+def generate_test_data_server_side(cursor):
+    """Generate synthetic test data inside Postgres with generate_series and random()"""
+    print("Generating test data server-side...")
+    cursor.execute(SERVER_SIDE_GENERATION_SQL, {
+        'countries': COUNTRIES,
+        'plan_types': PLAN_TYPES,
+        'genres': GENRES,
+        'total_users': TOTAL_USERS,
+        'total_movies': TOTAL_MOVIES,
+        'min_movies': MOVIES_PER_USER_RANGE[0],
+        'max_movies': MOVIES_PER_USER_RANGE[1],
+    })
+
+
+def allocate_ids(cursor, table, column, count):
+    """Reserve count ids from the column's identity sequence in one round trip"""
+    cursor.execute("SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)",
+                   (table, column, count))
+    return [row[0] for row in cursor.fetchall()]
+
+
+def copy_rows(cursor, table, columns, rows):
+    """Bulk load rows into table with COPY FROM STDIN in CSV format"""
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    buf.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buf)
+
 
 def generate_test_data(cursor):
     fake = faker.Faker()
 
-    # Constants for data generation
-    TOTAL_USERS = 1000
-    TOTAL_MOVIES = 200
-    MOVIES_PER_USER_RANGE = (5, 20)
-    GENRES = ['Action', 'Comedy', 'Drama', 'Horror', 'Sci-Fi', 'Romance', 'Documentary', 'Thriller']
-    PLAN_TYPES = ['Basic', 'Standard', 'Premium']
-    COUNTRIES = ['USA', 'Canada', 'UK', 'France', 'Germany', 'Japan', 'Australia', 'Brazil']
+    now = datetime.now().replace(microsecond=0)
+    today_ord = now.date().toordinal()
 
     # Generate Users
     print("Generating users...")
-    user_data = []
-    for _ in range(TOTAL_USERS):
-        signup_date = fake.date_between(start_date='-3y', end_date='today')
-        user = (
-            fake.name(),
-            fake.email(),
-            signup_date,
-            random.choice(COUNTRIES)
-        )
-        cursor.execute("""
-            INSERT INTO users (name, email, signup_date, country)
-            VALUES (%s, %s, %s, %s) RETURNING user_id
-        """, user)
-        user_id = cursor.fetchone()[0]
-        user_data.append((user_id, signup_date))
+    names = random.choices([fake.name() for _ in range(FAKER_POOL_SIZE)], k=TOTAL_USERS)
+    email_pool = [fake.email().split('@') for _ in range(FAKER_POOL_SIZE)]
+    # Pooled addresses get a row-index suffix so every user's email stays unique
+    emails = [f"{local}{i}@{domain}"
+              for i, (local, domain) in enumerate(random.choices(email_pool, k=TOTAL_USERS), start=1)]
+    signup_ords = np.random.randint(today_ord - 3 * 365, today_ord + 1, size=TOTAL_USERS)
+    countries = random.choices(COUNTRIES, k=TOTAL_USERS)
+    user_ids = allocate_ids(cursor, 'users', 'user_id', TOTAL_USERS)
+    user_rows = []
+    for user_id, name, email, signup_ord, country in zip(
+            user_ids, names, emails, signup_ords.tolist(), countries):
+        user_rows.append((
+            user_id,
+            name,
+            email,
+            date.fromordinal(signup_ord),
+            country
+        ))
+    copy_rows(cursor, 'users', ('user_id', 'name', 'email', 'signup_date', 'country'), user_rows)
+    user_data = [(user[0], user[3]) for user in user_rows]
 
     # Generate Subscriptions
     print("Generating subscriptions...")
-    for user_id, signup_date in user_data:
-        status = random.choices(['active', 'cancelled', 'paused'], weights=[0.8, 0.15, 0.05])[0]
-        renewal_date = datetime.now().date() + timedelta(days=random.randint(1, 365))
+    statuses = random.choices(['active', 'cancelled', 'paused'], weights=[0.8, 0.15, 0.05], k=TOTAL_USERS)
+    plan_types = random.choices(PLAN_TYPES, k=TOTAL_USERS)
+    renewal_offsets = np.random.randint(1, 366, size=TOTAL_USERS).tolist()
+    sub_rows = []
+    for (user_id, signup_date), status, plan_type, renewal_offset in zip(
+            user_data, statuses, plan_types, renewal_offsets):
+        renewal_date = now.date() + timedelta(days=renewal_offset)
         if status == 'cancelled':
-            renewal_date = fake.date_between(start_date=signup_date, end_date='today')
-
-        cursor.execute("""
-            INSERT INTO subscriptions (user_id, plan_type, status, renewal_date)
-            VALUES (%s, %s, %s, %s)
-        """, (user_id, random.choice(PLAN_TYPES), status, renewal_date))
+            renewal_date = date.fromordinal(random.randint(signup_date.toordinal(), today_ord))
+        sub_rows.append((user_id, plan_type, status, renewal_date))
+    # No RETURNING needed: send every row as one pre-rendered statement
+    args_str = b",".join(cursor.mogrify("(%s, %s, %s, %s)", row) for row in sub_rows)
+    cursor.execute(b"INSERT INTO subscriptions (user_id, plan_type, status, renewal_date) VALUES " + args_str)
 
     # Generate Movies
     print("Generating movies...")
-    movie_data = []
-    for _ in range(TOTAL_MOVIES):
-        movie = (
+    genres = random.choices(GENRES, k=TOTAL_MOVIES)
+    release_years = np.random.randint(1990, 2025, size=TOTAL_MOVIES).tolist()
+    ratings = np.round(np.random.uniform(1.0, 10.0, size=TOTAL_MOVIES), 1).tolist()  # 1.0 to 10.0
+    movie_data = allocate_ids(cursor, 'movies', 'movie_id', TOTAL_MOVIES)
+    movie_rows = []
+    for movie_id, genre, release_year, rating in zip(movie_data, genres, release_years, ratings):
+        movie_rows.append((
+            movie_id,
             fake.catch_phrase(),  # as movie title
-            random.choice(GENRES),
-            random.randint(1990, 2024),
-            round(random.uniform(1.0, 10.0), 1)  # rating between 1.0 and 10.0
-        )
-        cursor.execute("""
-            INSERT INTO movies (title, genre, release_year, rating)
-            VALUES (%s, %s, %s, %s) RETURNING movie_id
-        """, movie)
-        movie_data.append(cursor.fetchone()[0])
+            genre,
+            release_year,
+            rating
+        ))
+    copy_rows(cursor, 'movies', ('movie_id', 'title', 'genre', 'release_year', 'rating'), movie_rows)
 
     # Generate Viewing History
     print("Generating viewing history...")
-    for user_id, signup_date in user_data:
-        num_movies = random.randint(*MOVIES_PER_USER_RANGE)
+    history_rows = []
+    now_ts = int(now.timestamp())
+    movies_per_user = np.random.randint(MOVIES_PER_USER_RANGE[0], MOVIES_PER_USER_RANGE[1] + 1,
+                                        size=TOTAL_USERS).tolist()
+    durations = iter(np.random.randint(10, 181, size=sum(movies_per_user)).tolist())
+    for (user_id, signup_date), num_movies in zip(user_data, movies_per_user):
         watched_movies = random.sample(movie_data, num_movies)
+        signup_ts = int(datetime.combine(signup_date, datetime.min.time()).timestamp())
+        watch_ts = np.random.randint(signup_ts, now_ts + 1, size=num_movies)
+
+        for movie_id, ts in zip(watched_movies, watch_ts.tolist()):
+            watch_date = datetime.fromtimestamp(ts)
+            duration = next(durations)
+            history_rows.append((user_id, movie_id, watch_date, duration))
+    copy_rows(cursor, 'viewing_history', ('user_id', 'movie_id', 'watch_time', 'duration_watched'),
+              history_rows)
 
-        for movie_id in watched_movies:
-            watch_date = fake.date_time_between(
-                start_date=signup_date,
-                end_date='now'
-            )
-            duration = random.randint(10, 180)
 
-            cursor.execute("""
-                INSERT INTO viewing_history (user_id, movie_id, watch_time, duration_watched)
-                VALUES (%s, %s, %s, %s)
-            """, (user_id, movie_id, watch_date, duration))
+def add_foreign_keys(cursor):
+    """Add foreign keys once data is loaded; VALIDATE checks each in a single scan"""
+    foreign_keys = [
+        ('subscriptions', 'fk_sub_user', 'user_id', 'users(user_id)'),
+        ('viewing_history', 'fk_vh_user', 'user_id', 'users(user_id)'),
+        ('viewing_history', 'fk_vh_movie', 'movie_id', 'movies(movie_id)'),
+    ]
+    for table, name, column, target in foreign_keys:
+        cursor.execute(f"""
+            ALTER TABLE {table} ADD CONSTRAINT {name}
+            FOREIGN KEY ({column}) REFERENCES {target} NOT VALID
+        """)
+        cursor.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {name}")
 
 
 def verify_data(cursor):
@@ -96,7 +211,7 @@ def setup_database(conn):
         # Create tables
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS users (
-                user_id SERIAL PRIMARY KEY,
+                user_id INT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
                 name VARCHAR(50),
                 email VARCHAR(100),
                 signup_date DATE,
@@ -106,8 +221,8 @@ def setup_database(conn):
 
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS subscriptions (
-                subscription_id SERIAL PRIMARY KEY,
-                user_id INT REFERENCES users(user_id),
+                subscription_id INT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+                user_id INT,
                 plan_type VARCHAR(20),
                 status VARCHAR(20),
                 renewal_date DATE
@@ -116,7 +231,7 @@ def setup_database(conn):
 
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS movies (
-                movie_id SERIAL PRIMARY KEY,
+                movie_id INT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
                 title VARCHAR(100),
                 genre VARCHAR(50),
                 release_year INT,
@@ -126,19 +241,29 @@ def setup_database(conn):
 
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS viewing_history (
-                history_id SERIAL PRIMARY KEY,
-                user_id INT REFERENCES users(user_id),
-                movie_id INT REFERENCES movies(movie_id),
+                history_id INT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+                user_id INT,
+                movie_id INT,
                 watch_time TIMESTAMP,
                 duration_watched INT
             )
         """)
 
 
-def populate_database(conn):
-    """Populate database with test data"""
+def populate_database(conn, realistic_names=False):
+    """Populate database with test data
+
+    Data is generated server-side by default; realistic_names=True uses the
+    client-side Faker path instead, at the cost of shipping every row.
+    """
     with conn.cursor() as cursor:
-        generate_test_data(cursor)
+        # The whole load runs in one transaction, so skip waiting on the WAL flush
+        cursor.execute("SET LOCAL synchronous_commit = OFF")
+        if realistic_names:
+            generate_test_data(cursor)
+        else:
+            generate_test_data_server_side(cursor)
+        add_foreign_keys(cursor)
         conn.commit()
         print("\nVerifying data counts:")
         verify_data(cursor)
\ No newline at end of file
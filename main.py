@@ -1,6 +1,11 @@
 import os
 import time
 import random
+import json
+import hashlib
+import sqlite3
+import asyncio
+import threading
 import psycopg2
 from datetime import datetime
 import google.generativeai as genai
@@ -11,8 +16,17 @@ from typing import List, Optional
 import re
 from generate import setup_database, populate_database
 
+MODEL_NAME = 'gemini-1.5-flash'
+SQL_CACHE_PATH = os.getenv("SQL_CACHE_PATH", ".sql_cache.sqlite")
+# Opt-in host dir bind-mounted as the container's socket dir; TCP is used when unset
+PG_SOCKET_DIR = os.getenv("PG_SOCKET_DIR")
+MAX_RETRIES = 3
+FETCH_CHUNK_SIZE = 1000
+SAMPLE_ROWS = 3
+_SQL_FENCE_RE = re.compile(r'^```sql\s*|\s*```$', re.DOTALL)
 
-@dataclass
+
+@dataclass(slots=True)
 class QueryMetrics:
     prompt: str
     sql_query: str
@@ -25,12 +39,42 @@ class QueryMetrics:
     timestamp: datetime
 
 
+class SQLCache:
+    """SQLite-backed store of generated SQL keyed by a hash of the request"""
+
+    def __init__(self, path: str = SQL_CACHE_PATH):
+        # Shared across the worker threads used for concurrent generation
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.execute("CREATE TABLE IF NOT EXISTS sql_cache (key TEXT PRIMARY KEY, sql TEXT)")
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(model: str, prompt: str) -> str:
+        payload = json.dumps({"model": model, "prompt": prompt}, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self.lock:
+            row = self.conn.execute("SELECT sql FROM sql_cache WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, sql: str):
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO sql_cache (key, sql) VALUES (?, ?)", (key, sql))
+            self.conn.commit()
+
+
 class NetflixChaosRunner:
     def __init__(self):
         load_dotenv()
         genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
         self.metrics: List[QueryMetrics] = []
         self.chaos_active = True
+        self.sql_cache = SQLCache()
+        self._cursor = None
+        # Jittered backoff drawn once per run so retries sleep on a fixed schedule
+        self._backoff = [random.uniform(0.1, 0.5) * (i + 1) for i in range(MAX_RETRIES)]
 
     def generate_sql_query(self, prompt: str) -> str:
         structured_prompt = f"""You are a SQL query generator for a Netflix-like database. 
@@ -45,13 +89,27 @@ class NetflixChaosRunner:
         Task: {prompt}
         """
 
-        model = genai.GenerativeModel('gemini-1.5-flash')
+        cache_key = SQLCache.make_key(MODEL_NAME, structured_prompt)
+        cached_sql = self.sql_cache.get(cache_key)
+        if cached_sql is not None:
+            return cached_sql
+
+        model = genai.GenerativeModel(MODEL_NAME)
         response = model.generate_content(structured_prompt)
 
-        clean_sql = response.text.strip()
-        if clean_sql.startswith("```sql"):
-            clean_sql = re.sub(r'^```sql\s*|\s*```$', '', clean_sql, flags=re.DOTALL)
-        return clean_sql.strip()
+        clean_sql = _SQL_FENCE_RE.sub('', response.text.strip()).strip()
+        self.sql_cache.set(cache_key, clean_sql)
+        return clean_sql
+
+    async def generate_sql_queries(self, prompts: List[str]) -> List[str]:
+        """Generate SQL for all prompts concurrently, preserving prompt order"""
+        return await asyncio.gather(*(asyncio.to_thread(self.generate_sql_query, p) for p in prompts))
+
+    def get_cursor(self, conn):
+        """Return the cursor for chaos and settings statements, opening it on first use"""
+        if self._cursor is None or self._cursor.connection is not conn:
+            self._cursor = conn.cursor()
+        return self._cursor
 
     def simulate_db_specific_chaos(self, conn):
         if not self.chaos_active or random.random() > 0.3:
@@ -72,15 +130,14 @@ class NetflixChaosRunner:
         print(f"🌪️ Simulating database chaos: {chaos_type}")
 
         try:
-            with conn.cursor() as cur:
-                cur.execute(chaos_types[chaos_type])
+            self.get_cursor(conn).execute(chaos_types[chaos_type])
             conn.commit()
         except Exception as e:
             print(f"Chaos error (expected): {e}")
 
         return chaos_type
 
-    def execute_query_with_retry(self, conn, sql_query: str, max_retries: int = 3):
+    def execute_query_with_retry(self, conn, sql_query: str, max_retries: int = MAX_RETRIES):
         metrics = QueryMetrics(
             prompt="",
             sql_query=sql_query,
@@ -101,22 +158,33 @@ class NetflixChaosRunner:
                 if db_chaos:
                     metrics.chaos_type = db_chaos
 
-                with conn.cursor() as cursor:
+                # Server-side cursor streams the result; only a count and the sample rows are kept.
+                # The whole result is drained, so plan for full retrieval rather than fast start
+                self.get_cursor(conn).execute("SET LOCAL cursor_tuple_fraction = 1.0")
+                sample_rows = []
+                rows_returned = 0
+                with conn.cursor(name='stream_cur') as cursor:
                     cursor.execute(sql_query)
-                    results = cursor.fetchall()
-                    conn.commit()
-
-                    metrics.success = True
-                    metrics.rows_returned = len(results)
-                    metrics.retry_count = attempt
-                    return metrics, results
+                    while True:
+                        chunk = cursor.fetchmany(FETCH_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        rows_returned += len(chunk)
+                        if len(sample_rows) < SAMPLE_ROWS:
+                            sample_rows.extend(chunk[:SAMPLE_ROWS - len(sample_rows)])
+                conn.commit()
+
+                metrics.success = True
+                metrics.rows_returned = rows_returned
+                metrics.retry_count = attempt
+                return metrics, sample_rows
 
             except psycopg2.Error as e:
                 conn.rollback()
                 metrics.error_type = str(e)
                 metrics.retry_count = attempt + 1
                 print(f"🔄 Retry {attempt + 1}/{max_retries}: {e}")
-                time.sleep(random.uniform(0.1, 0.5) * (attempt + 1))
+                time.sleep(self._backoff[min(attempt, len(self._backoff) - 1)])
 
             finally:
                 metrics.execution_time = time.time() - start_time
@@ -126,9 +194,14 @@ class NetflixChaosRunner:
     def analyze_metrics(self):
         """Analyze the collected metrics"""
         total_queries = len(self.metrics)
-        successful_queries = sum(1 for m in self.metrics if m.success)
-        avg_execution_time = sum(m.execution_time for m in self.metrics) / total_queries
-        chaos_incidents = sum(1 for m in self.metrics if m.chaos_type is not None)
+        successful_queries = 0
+        total_execution_time = 0.0
+        chaos_incidents = 0
+        for m in self.metrics:
+            successful_queries += m.success
+            total_execution_time += m.execution_time
+            chaos_incidents += m.chaos_type is not None
+        avg_execution_time = total_execution_time / total_queries
 
         return {
             "Total Queries": total_queries,
@@ -138,7 +211,11 @@ class NetflixChaosRunner:
         }
 
     def run_resilience_test(self):
-        with PostgresContainer("postgres:15") as postgres:
+        postgres = PostgresContainer("postgres:15")
+        if PG_SOCKET_DIR:
+            postgres.with_volume_mapping(PG_SOCKET_DIR, "/var/run/postgresql", "rw")
+
+        with postgres:
             db_params = {
                 "host": postgres.get_container_host_ip(),
                 "port": postgres.get_exposed_port(5432),
@@ -146,6 +223,9 @@ class NetflixChaosRunner:
                 "user": "test",
                 "password": "test"
             }
+            if PG_SOCKET_DIR:
+                # UNIX socket skips the TCP stack; the socket is named after the in-container port
+                db_params.update(host=PG_SOCKET_DIR, port=5432)
 
             print("🚀 Starting Netflix-style database resilience test...")
 
@@ -167,21 +247,23 @@ class NetflixChaosRunner:
                 "Find users who have watched all movies of a particular genre"
             ]
 
-            for prompt in test_prompts:
+            # LLM calls are network-bound and independent; queries below stay serial on one connection
+            sql_queries = asyncio.run(self.generate_sql_queries(test_prompts))
+
+            for prompt, sql_query in zip(test_prompts, sql_queries):
                 print(f"\n{'=' * 50}")
                 print(f"📝 Testing prompt: {prompt}")
 
-                sql_query = self.generate_sql_query(prompt)
                 print(f"🔍 Generated SQL: {sql_query}")
 
-                metrics, results = self.execute_query_with_retry(conn, sql_query)
+                metrics, sample_rows = self.execute_query_with_retry(conn, sql_query)
                 metrics.prompt = prompt
                 self.metrics.append(metrics)
 
-                if results is not None:
-                    print(f"✅ Query successful ({len(results)} rows)")
+                if sample_rows is not None:
+                    print(f"✅ Query successful ({metrics.rows_returned} rows)")
                     print("Sample results:")
-                    for row in results[:3]:
+                    for row in sample_rows:
                         print(row)
                 else:
                     print("❌ Query failed after all retries")